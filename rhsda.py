@@ -1,4 +1,4 @@
-#!/usr/bin/python2
+#!/usr/bin/python3
 # -*- coding: utf-8 -*-
 #-------------------------------------------------------------------------------
 # Copyright 2016, 2017
@@ -16,19 +16,51 @@
 #-------------------------------------------------------------------------------
 
 # Modules from standard library
-from __future__ import print_function
 import requests
+from requests.adapters import HTTPAdapter
+try:
+    from urllib3.util.retry import Retry
+except ImportError:
+    from requests.packages.urllib3.util.retry import Retry
 import logging
 import sys
+import os
+import io
 import re
-import textwrap, fcntl, termios, struct
+import shutil
+import textwrap
 import json
 import signal
-import copy_reg
-import types
+import sqlite3
+import time
 import multiprocessing.dummy as multiprocessing
+from urllib.parse import urlencode
 from argparse import Namespace
 
+# Optional orjson module for faster JSON parsing & serialization
+haveOrjson = False
+try:
+    import orjson
+    haveOrjson = True
+except ImportError:
+    pass
+
+# Optional requests_cache module for caching API responses on disk
+haveRequestsCache = False
+try:
+    import requests_cache
+    haveRequestsCache = True
+except ImportError:
+    pass
+
+# Optional httpx module for retrieving over HTTP/2
+haveHttpx = False
+try:
+    import httpx
+    haveHttpx = True
+except ImportError:
+    pass
+
 
 # Logging
 logging.addLevelName(25, 'NOTICE')
@@ -101,35 +133,42 @@ cveFields.aliases_printable = [
 # A list of all fields + all aliases
 cveFields.all_plus_aliases = list(cveFields.all)
 cveFields.all_plus_aliases.extend([k for k in cveFields.aliases])
-del(k)
 
 
 # Regex to match a CVE id string
 cve_regex_string = 'CVE-[0-9]{4}-[0-9]{4,}'
 cve_regex = re.compile(cve_regex_string, re.IGNORECASE)
+# Regex to validate a whole string as a CVE id
+cve_id_regex = re.compile(r'\A{0}\Z'.format(cve_regex_string), re.IGNORECASE)
+# Regexes used when rendering plaintext CVE output
+cwe_regex = re.compile("CWE-[0-9]+")
+newline_regex = re.compile(r"\n[\n\s]*")
 
 
-# The following function & copy_reg.pickle() call make it possible for pickle to serialize class functions
-# This is critical to allow multiprocessing.Pool.map_async() to work as desired
-# See: http://stackoverflow.com/a/19861595
-def _reduce_method(m):
-    if m.__self__ is None:
-        return getattr, (m.__class__, m.__func__.__name__)
-    else:
-        return getattr, (m.__self__, m.__func__.__name__)
+# Set default number of worker threads
+# Workers spend nearly all their time waiting on the network, so don't let a low CPU count starve them
+numThreadsDefault = max(8, (os.cpu_count() or 1) * 2)
 
-copy_reg.pickle(types.MethodType, _reduce_method)
+# Retry transient server errors a few times, with exponential backoff
+retryTotal = 3
+retryBackoff = 0.3
+retryStatuses = [502, 503, 504]
 
+# Terminal width, detected on first use
+terminalWidth = None
 
-# Set default number of worker threads
-if multiprocessing.cpu_count() <= 2:
-    numThreadsDefault = 4
-else:
-    numThreadsDefault = multiprocessing.cpu_count() * 2
 
+def jprint(jsoninput, compact=False):
+    """Pretty-print jsoninput.
 
-def jprint(jsoninput):
-    """Pretty-print jsoninput."""
+    With *compact* True, skip indentation & key-sorting (e.g., for piping to jq).
+    """
+    if haveOrjson:
+        if compact:
+            return orjson.dumps(jsoninput).decode('utf-8') + "\n"
+        return orjson.dumps(jsoninput, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS).decode('utf-8') + "\n"
+    if compact:
+        return json.dumps(jsoninput, separators=(',', ':')) + "\n"
     return json.dumps(jsoninput, sort_keys=True, indent=2) + "\n"
 
 
@@ -153,8 +192,8 @@ def extract_cves_from_input(obj, descriptiveNoun=None):
         found.extend(cve_regex.findall(line))
     if found:
         originalCount = len(found)
-        # Converting to a set removes duplicates
-        found = list(set([x.upper() for x in found]))
+        # Remove duplicates, keeping first-seen order
+        found = list(dict.fromkeys(x.upper() for x in found))
         dupesRemoved = originalCount - len(found)
         if dupesRemoved:
             dupes = "; {0} duplicates removed".format(dupesRemoved)
@@ -171,16 +210,78 @@ class ApiClient:
     """Portable object to interface with the Red Hat Security Data API.
 
     https://access.redhat.com/documentation/en/red-hat-security-data-api/
+
+    With *cacheTtl* set to a number of seconds, API responses are cached on disk in
+    ~/.cache/rhsecapi.sqlite for that long (requires optional requests_cache module).
+
+    With *http2* True, API requests from all worker threads are multiplexed over a
+    single HTTP/2 connection (requires optional httpx module with h2); this bypasses
+    the on-disk cache.
     """
 
-    def __init__(self, logLevel='notice'):
+    def __init__(self, logLevel='notice', cacheTtl=0, http2=False):
         self.cfg = Namespace()
         self.cfg.apiUrl = 'https://access.redhat.com/labs/securitydataapi'
         logger.setLevel(logLevel.upper())
+        self.http2Client = None
+        if http2:
+            if haveHttpx:
+                try:
+                    self.http2Client = httpx.Client(timeout=httpx.Timeout(30, connect=3.05), transport=httpx.HTTPTransport(http2=True, retries=retryTotal))
+                except ImportError:
+                    logger.warning("Missing optional python module h2; not using HTTP/2")
+            else:
+                logger.warning("Missing optional python module httpx; not using HTTP/2")
+        # Share one keep-alive connection pool across all requests (and worker threads)
+        if self.http2Client:
+            # API requests go via HTTP/2, so this session is only used for pastebin uploads
+            if cacheTtl:
+                logger.debug("Using HTTP/2; not caching API responses")
+            self.session = requests.Session()
+        elif cacheTtl and haveRequestsCache:
+            cacheDir = os.path.expanduser('~/.cache')
+            try:
+                os.makedirs(cacheDir, exist_ok=True)
+                self.session = requests_cache.CachedSession(
+                    cache_name=os.path.join(cacheDir, 'rhsecapi'), backend='sqlite',
+                    expire_after=cacheTtl, allowable_codes=(200,), cache_control=True)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Unable to use on-disk cache in '{0}'; not caching API responses: {1}".format(cacheDir, e))
+                self.session = requests.Session()
+            else:
+                logger.debug("Caching API responses for {0}s in '{1}/rhsecapi.sqlite'".format(cacheTtl, cacheDir))
+        else:
+            if cacheTtl:
+                logger.info("Missing optional python module requests_cache; not caching API responses")
+            self.session = requests.Session()
+        self._poolSize = 0
+        self._set_pool_size(numThreadsDefault)
+
+    def close(self):
+        """Release pooled connections held by this client."""
+        if self.http2Client:
+            self.http2Client.close()
+        self.session.close()
+
+    def _set_pool_size(self, poolSize):
+        """Ensure the session's connection pool can keep *poolSize* connections alive."""
+        if poolSize <= self._poolSize:
+            return
+        # raise_on_status=False hands back the final 5xx response so raise_for_status() raises HTTPError
+        retries = Retry(total=retryTotal, backoff_factor=retryBackoff, status_forcelist=retryStatuses, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=poolSize, max_retries=retries)
+        for prefix in ('https://', 'http://'):
+            # Release the connections pooled by the adapter being replaced
+            self.session.get_adapter(prefix).close()
+            self.session.mount(prefix, adapter)
+        self._poolSize = poolSize
 
     def _get_terminal_width(self):
-        h, w, hp, wp = struct.unpack('HHHH', fcntl.ioctl(0, termios.TIOCGWINSZ, struct.pack('HHHH', 0, 0, 0, 0)))
-        return w
+        global terminalWidth
+        if terminalWidth:
+            return terminalWidth
+        terminalWidth = shutil.get_terminal_size((80, 24)).columns
+        return terminalWidth
 
     def __validate_data_type(self, dT):
         dataTypes = ['cvrf', 'cve', 'oval', 'iava']
@@ -196,16 +297,14 @@ class ApiClient:
         url = self.cfg.apiUrl + url
         u = ""
         if params:
-            for k in params:
-                if params[k]:
-                    u += "&{0}={1}".format(k, params[k])
-            u = u.replace("&", "?", 1)
+            u = urlencode([(k, v) for k, v in params.items() if v])
+            if u:
+                u = "?" + u
         logger.info("Getting {0}{1}".format(url, u))
+        if self.http2Client:
+            return self.__get_http2(url, params)
         try:
-            r = requests.get(url, params=params)
-        except requests.exceptions.ConnectionError as e:
-            logger.error(e)
-            raise
+            r = self.session.get(url, params=params, timeout=(3.05, 30))
         except requests.exceptions.RequestException as e:
             logger.error(e)
             raise
@@ -214,10 +313,45 @@ class ApiClient:
             baseurl = r.url.split("/")[-2]
         logger.debug("Return '.../{0}': Status {1}, Content-Type {2}".format(baseurl, r.status_code, r.headers['Content-Type'].split(";")[0]))
         r.raise_for_status()
+        return self.__decode(r)
+
+    def __get_http2(self, url, params):
+        """Like __get() but via httpx, translating its errors into requests exceptions."""
+        # Unlike requests, httpx sends None-valued params as empty strings
+        params = dict((k, v) for k, v in params.items() if v is not None)
+        # The transport only retries failed connections; retry transient server errors here
+        for attempt in range(retryTotal + 1):
+            try:
+                r = self.http2Client.get(url, params=params)
+            except httpx.HTTPError as e:
+                logger.error(e)
+                raise requests.exceptions.ConnectionError(str(e))
+            if r.status_code not in retryStatuses or attempt == retryTotal:
+                break
+            logger.debug("Retrying after Status {0}".format(r.status_code))
+            time.sleep(retryBackoff * 2 ** attempt)
+        logger.debug("Return '.../{0}': Status {1}, Content-Type {2}, {3}".format(r.url.path.split("/")[-1], r.status_code, r.headers['Content-Type'].split(";")[0], r.http_version))
+        if r.is_error:
+            raise requests.exceptions.HTTPError("{0} {1} for url: {2}".format(r.status_code, r.reason_phrase, r.url))
+        return self.__decode(r)
+
+    def __decode(self, r):
+        """Return parsed JSON or text from response *r*."""
         if 'application/json' in r.headers['Content-Type']:
-            return r.json()
+            # Parse the raw body bytes directly, skipping decoding to an intermediate str
+            if haveOrjson:
+                return orjson.loads(r.content)
+            return json.loads(r.content)
         else:
-            return r.content
+            return r.text
+
+    def __get_or_none(self, getter, query):
+        """Return getter(query), or None if the API responds with an HTTP error (e.g. 404)."""
+        try:
+            return getter(query)
+        except requests.exceptions.HTTPError as e:
+            logger.info(e)
+            return None
 
     def _find(self, dataType, params, outFormat):
         self.__validate_data_type(dataType)
@@ -268,7 +402,7 @@ class ApiClient:
     def find_cves(self, params=None, outFormat='json',
                   before=None, after=None, bug=None, advisory=None, severity=None,
                   product=None, package=None, cwe=None, cvss_score=None, cvss3_score=None,
-                  page=None, per_page=None):
+                  page=None, per_page=None, ids=None):
         """Find CVEs by recent or attributes.
 
         Provides an index to recent CVEs when no parameters are passed.
@@ -293,6 +427,7 @@ class ApiClient:
                 'cvss3_score': cvss3_score,
                 'page': page,
                 'per_page': per_page,
+                'ids': ids,
                 }
         return self._find('cve', params, outFormat)
 
@@ -352,8 +487,36 @@ class ApiClient:
         return self._retrieve('cvrf', '{0}/oval'.format(rhsa), outFormat)
 
     def get_cve(self, cve, outFormat='json'):
-        """Retrieve full details of a CVE."""
-        return self._retrieve('cve', cve, outFormat)
+        """Retrieve full details of a CVE.
+
+        With *outFormat* of "json", 'affected_release' & 'package_state' are always
+        lists (the API returns a bare object when there's only one item).
+        """
+        result = self._retrieve('cve', cve, outFormat)
+        if outFormat == 'json':
+            for k in ('affected_release', 'package_state'):
+                if isinstance(result.get(k), dict):
+                    result[k] = [result[k]]
+        return result
+
+    def get_cve_summaries(self, cves, chunkSize=100):
+        """Retrieve search-result summaries for a list of CVEs in bulk.
+
+        CVEs are looked up *chunkSize* at a time via the 'ids' search param.
+        Returns a dict mapping CVE ids to summary objects; CVEs that the API didn't
+        return are left out.
+        """
+        summaries = {}
+        wanted = set(cves)
+        for i in range(0, len(cves), chunkSize):
+            chunk = cves[i:i + chunkSize]
+            # Bypass _find() to avoid its "found with search query" notice
+            result = self.__get('/cve.json', {'ids': ",".join(chunk), 'per_page': len(chunk)})
+            logger.info("Bulk CVE lookup returned {0} of {1} summaries".format(len(result), len(chunk)))
+            for summary in result:
+                if summary['CVE'] in wanted:
+                    summaries[summary['CVE']] = summary
+        return summaries
 
     def get_oval(self, rhsa, outFormat='json'):
         """Retrieve OVAL details for an RHSA."""
@@ -365,28 +528,148 @@ class ApiClient:
 
     def __stripjoin(self, input, oneLineEach=False):
         """Strip whitespace from input or input list."""
-        text = ""
         if isinstance(input, list):
             if oneLineEach:
-                text = "\n".join(input).encode('utf-8').strip()
+                text = "\n".join(input).strip()
             else:
-                text = "  ".join(input).encode('utf-8').strip()
+                text = "  ".join(input).strip()
         else:
-            text = input.encode('utf-8').strip()
+            text = input.strip()
         if oneLineEach:
             text = "\n" + text
-            text = re.sub(r"\n[\n\s]*", "\n   ", text)
+            text = newline_regex.sub("\n   ", text)
         else:
-            text = re.sub(r"\n[\n\s]*", "  ", text)
+            text = newline_regex.sub("  ", text)
             if self.wrapper:
                 text = "\n" + "\n".join(self.wrapper.wrap(text))
         return text
 
-    def __check_field(self, field, jsoninput):
-        """Return True if field is desired and exists in jsoninput."""
-        if field in self.cfg.desiredFields and field in jsoninput:
-            return True
-        return False
+    def _render_cve_threat_severity(self, J, out):
+        u = ""
+        if self.cfg.urls:
+            u = " (https://access.redhat.com/security/updates/classification)"
+        out.append("  SEVERITY : {0} Impact{1}".format(J['threat_severity'], u))
+
+    def _render_cve_public_date(self, J, out):
+        out.append("  DATE     : {0}".format(J['public_date'].split("T")[0]))
+
+    def _render_cve_iava(self, J, out):
+        out.append("  IAVA     : {0}".format(J['iava']))
+
+    def _render_cve_cwe(self, J, out):
+        out.append("  CWE      : {0}".format(J['cwe']))
+        if self.cfg.urls:
+            cwes = cwe_regex.findall(J['cwe'])
+            if len(cwes) == 1:
+                out[-1] += " (http://cwe.mitre.org/data/definitions/{0}.html)".format(cwes[0].lstrip("CWE-"))
+            else:
+                for c in cwes:
+                    out.append("             (http://cwe.mitre.org/data/definitions/{0}.html)".format(c.lstrip("CWE-")))
+
+    def _render_cve_cvss(self, J, out):
+        vector = J['cvss']['cvss_scoring_vector']
+        if self.cfg.urls:
+            vector = "http://nvd.nist.gov/cvss.cfm?version=2&vector={0}".format(vector)
+        out.append("  CVSS     : {0} ({1})".format(J['cvss']['cvss_base_score'], vector))
+
+    def _render_cve_cvss3(self, J, out):
+        vector = J['cvss3']['cvss3_scoring_vector']
+        if self.cfg.urls:
+            vector = "https://www.first.org/cvss/calculator/3.0#{0}".format(vector)
+        out.append("  CVSS3    : {0} ({1})".format(J['cvss3']['cvss3_base_score'], vector))
+
+    def _render_cve_bugzilla(self, J, out):
+        if self.cfg.urls:
+            bug = J['bugzilla']['url']
+        else:
+            bug = J['bugzilla']['id']
+        out.append("  BUGZILLA : {0}".format(bug))
+
+    def _render_cve_acknowledgement(self, J, out):
+        out.append("  ACKNOWLEDGEMENT :  {0}".format(self.__stripjoin(J['acknowledgement'])))
+
+    def _render_cve_details(self, J, out):
+        out.append("  DETAILS  : {0}".format(self.__stripjoin(J['details'])))
+
+    def _render_cve_statement(self, J, out):
+        out.append("  STATEMENT : {0}".format(self.__stripjoin(J['statement'])))
+
+    def _render_cve_mitigation(self, J, out):
+        out.append("  MITIGATION : {0}".format(self.__stripjoin(J['mitigation'])))
+
+    def _render_cve_upstream_fix(self, J, out):
+        out.append("  UPSTREAM_FIX : {0}".format(J['upstream_fix']))
+
+    def _render_cve_references(self, J, out):
+        out.append("  REFERENCES :{0}".format(self.__stripjoin(J['references'], oneLineEach=True)))
+
+    def _render_cve_affected_release(self, J, out):
+        """Return True if spotlight-product matched any release."""
+        foundProduct = False
+        if self.cfg.product:
+            out.append("  FIXED_RELEASES matching '{0}' :".format(self.cfg.product))
+        else:
+            out.append("  FIXED_RELEASES :")
+        for release in J['affected_release']:
+            if self.cfg.product:
+                if self.regex_product.search(release['product_name']) or self.regex_product.search(release['cpe']):
+                    foundProduct = True
+                else:
+                    # If product doesn't match spotlight, go to next
+                    continue
+            pkg = ""
+            if 'package' in release:
+                pkg = " [{0}]".format(release['package'])
+            advisory = release['advisory']
+            if self.cfg.urls:
+                advisory = "https://access.redhat.com/errata/{0}".format(advisory)
+            out.append("   {0}:{1} via {2} ({3})".format(release['product_name'], pkg, advisory, release['release_date'].split("T")[0]))
+        if self.cfg.product and not foundProduct:
+            # If nothing found, remove the "FIXED_RELEASES" heading
+            out.pop()
+        return foundProduct
+
+    def _render_cve_package_state(self, J, out):
+        """Return True if spotlight-product matched any state."""
+        foundProduct = False
+        if self.cfg.product:
+            out.append("  FIX_STATES matching '{0}' :".format(self.cfg.product))
+        else:
+            out.append("  FIX_STATES :")
+        for state in J['package_state']:
+            if self.cfg.product:
+                if self.regex_product.search(state['product_name']) or self.regex_product.search(state['cpe']):
+                    foundProduct = True
+                else:
+                    # If product doesn't match spotlight, go to next
+                    continue
+            pkg = ""
+            if 'package_name' in state:
+                pkg = " [{0}]".format(state['package_name'])
+            out.append("   {0}: {1}{2}".format(state['fix_state'], state['product_name'], pkg))
+        if self.cfg.product and not foundProduct:
+            # If nothing found, remove the "FIX_STATES" heading
+            out.pop()
+        return foundProduct
+
+    # Plaintext renderer for each supported field, in display order
+    _cveRenderers = [
+        ('threat_severity', _render_cve_threat_severity),
+        ('public_date', _render_cve_public_date),
+        ('iava', _render_cve_iava),
+        ('cwe', _render_cve_cwe),
+        ('cvss', _render_cve_cvss),
+        ('cvss3', _render_cve_cvss3),
+        ('bugzilla', _render_cve_bugzilla),
+        ('acknowledgement', _render_cve_acknowledgement),
+        ('details', _render_cve_details),
+        ('statement', _render_cve_statement),
+        ('mitigation', _render_cve_mitigation),
+        ('upstream_fix', _render_cve_upstream_fix),
+        ('references', _render_cve_references),
+        ('affected_release', _render_cve_affected_release),
+        ('package_state', _render_cve_package_state),
+        ]
 
     def _get_and_parse_cve(self, cve):
         """Generate a plaintext representation of a CVE.
@@ -399,12 +682,15 @@ class ApiClient:
         """
         # Output array:
         out = []
-        try:
+        J = None
+        # Don't spend a request on something that can't be a CVE id
+        if cve_id_regex.match(cve):
             # Store json
-            J = self.get_cve(cve)
-        except requests.exceptions.HTTPError as e:
+            J = self.__get_or_none(self.get_cve, cve)
+        else:
+            logger.info("Skipping retrieval of '{0}'; not a valid CVE id".format(cve))
+        if J is None:
             # CVE not in RH CVE DB
-            logger.info(e)
             if self.cfg.product or self.cfg.onlyCount or self.cfg.outFormat.startswith('json'):
                 return False, ""
             else:
@@ -416,6 +702,9 @@ class ApiClient:
         # If json output requested
         if self.cfg.outFormat.startswith('json'):
             return True, J
+        # Nothing to render if only counting (unless product-matching decides the count)
+        if self.cfg.onlyCount and not self.cfg.product:
+            return True, ""
         # CVE ID
         name = ""
         if cve != J['name']:
@@ -424,124 +713,18 @@ class ApiClient:
         if self.cfg.urls:
             u = " (https://access.redhat.com/security/cve/{0})".format(cve)
         out.append("{0}{1}{2}".format(cve, name, u))
-        # SEVERITY
-        if self.__check_field('threat_severity', J):
-            u = ""
-            if self.cfg.urls:
-                u = " (https://access.redhat.com/security/updates/classification)"
-            out.append("  SEVERITY : {0} Impact{1}".format(J['threat_severity'], u))
-        # PUBLIC_DATE
-        if self.__check_field('public_date', J):
-            out.append("  DATE     : {0}".format(J['public_date'].split("T")[0]))
-        # IAVA
-        if self.__check_field('iava', J):
-            out.append("  IAVA     : {0}".format(J['iava']))
-        # CWE ID
-        if self.__check_field('cwe', J):
-            out.append("  CWE      : {0}".format(J['cwe']))
-            if self.cfg.urls:
-                cwes = re.findall("CWE-[0-9]+", J['cwe'])
-                if len(cwes) == 1:
-                    out[-1] += " (http://cwe.mitre.org/data/definitions/{0}.html)".format(cwes[0].lstrip("CWE-"))
-                else:
-                    for c in cwes:
-                        out.append("             (http://cwe.mitre.org/data/definitions/{0}.html)".format(c.lstrip("CWE-")))
-        # CVSS2
-        if self.__check_field('cvss', J):
-            vector = J['cvss']['cvss_scoring_vector']
-            if self.cfg.urls:
-                vector = "http://nvd.nist.gov/cvss.cfm?version=2&vector={0}".format(vector)
-            out.append("  CVSS     : {0} ({1})".format(J['cvss']['cvss_base_score'], vector))
-        # CVSS3
-        if self.__check_field('cvss3', J):
-            vector = J['cvss3']['cvss3_scoring_vector']
-            if self.cfg.urls:
-                vector = "https://www.first.org/cvss/calculator/3.0#{0}".format(vector)
-            out.append("  CVSS3    : {0} ({1})".format(J['cvss3']['cvss3_base_score'], vector))
-        # BUGZILLA
-        if 'bugzilla' in self.cfg.desiredFields:
-            if 'bugzilla' in J:
-                if self.cfg.urls:
-                    bug = J['bugzilla']['url']
-                else:
-                    bug = J['bugzilla']['id']
-                out.append("  BUGZILLA : {0}".format(bug))
-            else:
+        # Fields
+        foundProduct = False
+        for field, renderer in self.cfg.cveRenderers:
+            if field in J:
+                # Only the FIXED_RELEASES & FIX_STATES renderers return anything
+                if renderer(self, J, out):
+                    foundProduct = True
+            elif field == 'bugzilla':
                 out.append("  BUGZILLA : No Bugzilla data")
                 out.append("   Too new or too old? See: https://bugzilla.redhat.com/show_bug.cgi?id=CVE_legacy")
-        # ACKNOWLEDGEMENT
-        if self.__check_field('acknowledgement', J):
-            out.append("  ACKNOWLEDGEMENT :  {0}".format(self.__stripjoin(J['acknowledgement'])))
-        # DETAILS
-        if self.__check_field('details', J):
-            out.append("  DETAILS  : {0}".format(self.__stripjoin(J['details'])))
-        # STATEMENT
-        if self.__check_field('statement', J):
-            out.append("  STATEMENT : {0}".format(self.__stripjoin(J['statement'])))
-        # MITIGATION
-        if self.__check_field('mitigation', J):
-            out.append("  MITIGATION : {0}".format(self.__stripjoin(J['mitigation'])))
-        # UPSTREAM FIX
-        if self.__check_field('upstream_fix', J):
-            out.append("  UPSTREAM_FIX : {0}".format(J['upstream_fix']))
-        # REFERENCES
-        if self.__check_field('references', J):
-            out.append("  REFERENCES :{0}".format(self.__stripjoin(J['references'], oneLineEach=True)))
-        # AFFECTED RELEASE
-        foundProduct_affected_release = False
-        if self.__check_field('affected_release', J):
-            if self.cfg.product:
-                out.append("  FIXED_RELEASES matching '{0}' :".format(self.cfg.product))
-            else:
-                out.append("  FIXED_RELEASES :")
-            affected_release = J['affected_release']
-            if isinstance(affected_release, dict):
-                # When there's only one, it doesn't show up in a list
-                affected_release = [affected_release]
-            for release in affected_release:
-                if self.cfg.product:
-                    if self.regex_product.search(release['product_name']) or self.regex_product.search(release['cpe']):
-                        foundProduct_affected_release = True
-                    else:
-                        # If product doesn't match spotlight, go to next
-                        continue
-                pkg = ""
-                if 'package' in release:
-                    pkg = " [{0}]".format(release['package'])
-                advisory = release['advisory']
-                if self.cfg.urls:
-                    advisory = "https://access.redhat.com/errata/{0}".format(advisory)
-                out.append("   {0}:{1} via {2} ({3})".format(release['product_name'], pkg, advisory, release['release_date'].split("T")[0]))
-            if self.cfg.product and not foundProduct_affected_release:
-                # If nothing found, remove the "FIXED_RELEASES" heading
-                out.pop()
-        # PACKAGE STATE
-        foundProduct_package_state = False
-        if self.__check_field('package_state', J):
-            if self.cfg.product:
-                out.append("  FIX_STATES matching '{0}' :".format(self.cfg.product))
-            else:
-                out.append("  FIX_STATES :")
-            package_state = J['package_state']
-            if isinstance(package_state, dict):
-                # When there's only one, it doesn't show up in a list
-                package_state = [package_state]
-            for state in package_state:
-                if self.cfg.product:
-                    if self.regex_product.search(state['product_name']) or self.regex_product.search(state['cpe']):
-                        foundProduct_package_state = True
-                    else:
-                        # If product doesn't match spotlight, go to next
-                        continue
-                pkg = ""
-                if 'package_name' in state:
-                    pkg = " [{0}]".format(state['package_name'])
-                out.append("   {0}: {1}{2}".format(state['fix_state'], state['product_name'], pkg))
-            if self.cfg.product and not foundProduct_package_state:
-                # If nothing found, remove the "FIX_STATES" heading
-                out.pop()
         # If searching for product and not found return no output
-        if self.cfg.product and not (foundProduct_affected_release or foundProduct_package_state):
+        if self.cfg.product and not foundProduct:
             logger.info("Hiding {0} due to negative product match".format(cve))
             return None, ""
         # Return no output if only counting
@@ -562,13 +745,11 @@ class ApiClient:
         """
         # Output array:
         out = []
-        try:
-            # Store json
-            J = self.get_iava(iava)
-        except requests.exceptions.HTTPError as e:
+        # Store json
+        J = self.__get_or_none(self.get_iava, iava)
+        if J is None:
             # IAVA not in RH IAVA DB
-            logger.info(e)
-            if self.cfg.onlyCount or self.cfg.outFormat in ['list', 'json', 'jsonpretty']:
+            if self.cfg.onlyCount or self.cfg.outFormat in ['list', 'json', 'jsonpretty', 'jsoncompact']:
                 return False, "", 0
             else:
                 return False, "{0}\n  Not present in Red Hat IAVA database\n".format(iava), 0
@@ -632,7 +813,7 @@ class ApiClient:
         for f in fields:
             # Skip unknown fields
             if f not in cveFields.all_plus_aliases:
-                logger.warning("Field '{0}' is not a known field; valid fields:\n{2}".format(f, ", ".join(cveFields.all_plus_aliases)))
+                logger.warning("Field '{0}' is not a known field; valid fields:\n{1}".format(f, ", ".join(cveFields.all_plus_aliases)))
                 continue
             # Look-up aliases
             if f not in cveFields.all:
@@ -646,7 +827,9 @@ class ApiClient:
             else:
                 postProcessedFields.append(f)
         logger.debug("Enabled fields: '{0}'".format(", ".join(postProcessedFields)))
-        self.cfg.desiredFields = postProcessedFields
+        self.cfg.desiredFields = frozenset(postProcessedFields)
+        # Resolve which renderers to run once, rather than per CVE
+        self.cfg.cveRenderers = [(f, r) for f, r in self._cveRenderers if f in self.cfg.desiredFields]
 
     def _set_cve_plaintext_product(self, product):
         self.cfg.product = product
@@ -657,10 +840,10 @@ class ApiClient:
 
     def _set_cve_plaintext_width(self, wrapWidth):
         if wrapWidth == 1:
-            if sys.stdin.isatty():
+            if sys.stdout.isatty():
                 wrapWidth = self._get_terminal_width() - 2
             else:
-                logger.warning("Stdin redirection suppresses term-width auto-detection; setting WIDTH to 70")
+                logger.info("Stdout redirection suppresses term-width auto-detection; setting WIDTH to 70")
                 wrapWidth = 70
         if wrapWidth:
             self.wrapper = textwrap.TextWrapper(width=wrapWidth, initial_indent="   ", subsequent_indent="   ", replace_whitespace=False)
@@ -673,9 +856,9 @@ class ApiClient:
         """Use multi-threading to lookup a list of CVEs and return text output.
 
         *cves*:       A list of CVE ids or a str/file obj from which to regex CVE ids
-        *numThreads*: Number of concurrent worker threads; 0 == CPUs*2
+        *numThreads*: Number of concurrent worker threads; 0 == max(8, CPUs*2)
         *onlyCount*:  Whether to exit after simply logging number of valid/invalid CVEs
-        *outFormat*:  Control output format ("plaintext", "json", or "jsonpretty")
+        *outFormat*:  Control output format ("plaintext", "json", "jsonpretty", or "jsoncompact")
         *urls*:       Whether to add extra URLs to certain fields
         *fields*:     Customize which fields are displayed by passing comma-sep string
         *wrapWidth*:  Width for long fields; 1 auto-detects based on terminal size
@@ -694,6 +877,7 @@ class ApiClient:
         Setting to "plaintext" returns str object containing formatted output.
         Setting to "json" returns list object (i.e., original JSON)
         Setting to "jsonpretty" returns str object containing prettified JSON
+        Setting to "jsoncompact" returns str object containing compact JSON
 
         ON *FIELDS*:
 
@@ -726,24 +910,38 @@ class ApiClient:
 
         Finally: *fields* is case-insensitive.
         """
-        if outFormat not in ['plaintext', 'json', 'jsonpretty']:
-            raise ValueError("Invalid outFormat ('{0}') requested; should be one of: 'plaintext', 'json', 'jsonpretty'".format(outFormat))
-        if isinstance(cves, str) or isinstance(cves, file):
+        if outFormat not in ['plaintext', 'json', 'jsonpretty', 'jsoncompact']:
+            raise ValueError("Invalid outFormat ('{0}') requested; should be one of: 'plaintext', 'json', 'jsonpretty', 'jsoncompact'".format(outFormat))
+        if isinstance(cves, (str, io.IOBase)):
             cves = extract_cves_from_input(cves)
         elif not isinstance(cves, list):
             raise ValueError("Invalid 'cves=' argument input; must be list, string, or file obj")
         if not len(cves):
-            if outFormat in ['plaintext', 'jsonpretty']:
+            if outFormat in ['plaintext', 'jsonpretty', 'jsoncompact']:
                 return ""
             else:
                 return []
+        # When only counting, bulk search summaries can stand in for most per-CVE requests
+        prefound = []
+        toRetrieve = cves
+        if onlyCount and not product and len(cves) > 3:
+            try:
+                summaries = self.get_cve_summaries(list(dict.fromkeys(cves)))
+            except requests.exceptions.HTTPError as e:
+                logger.info(e)
+                summaries = {}
+            toRetrieve = [cve for cve in cves if cve not in summaries]
+            prefound = [(True, "")] * (len(cves) - len(toRetrieve))
+        # Retrieve each CVE only once, even if it appears in the list more than once
+        uniqueCves = list(dict.fromkeys(toRetrieve))
         # Configure threads
         if not numThreads:
             numThreads = numThreadsDefault
         # Lower threads for small work-loads 
-        if numThreads > len(cves):
-            numThreads = len(cves)
+        if numThreads > len(uniqueCves):
+            numThreads = max(len(uniqueCves), 1)
         logger.info("Using {0} worker threads".format(numThreads))
+        self._set_pool_size(numThreads)
         # Set cfg directives for our worker
         self.cfg.onlyCount = onlyCount
         self.cfg.urls = urls
@@ -758,9 +956,9 @@ class ApiClient:
         signal.signal(signal.SIGINT, original_sigint_handler)
         # Allow cancelling with Ctrl-c
         try:
-            p = pool.map_async(self._get_and_parse_cve, cves)
+            p = pool.map_async(self._get_and_parse_cve, uniqueCves)
             # Need to specify timeout; see: http://stackoverflow.com/a/35134329
-            results = p.get(timeout=timeout)
+            retrieved = dict(zip(uniqueCves, p.get(timeout=timeout)))
         except KeyboardInterrupt:
             logger.error("Received KeyboardInterrupt; terminating worker threads")
             pool.terminate()
@@ -768,6 +966,8 @@ class ApiClient:
         else:
             pool.close()
         pool.join()
+        # Map results back onto every original position
+        results = prefound + [retrieved[cve] for cve in toRetrieve]
         successValues, cveOutput = zip(*results)
         n_total = len(cves)
         n_hidden = successValues.count(None)
@@ -779,26 +979,22 @@ class ApiClient:
             return
         if outFormat == 'plaintext':
             # Remove all blank entries (created when spotlight-product hides a CVE)
-            cveOutput = list(cveOutput)
-            while 1:
-                try:
-                    cveOutput.remove("")
-                except ValueError:
-                    break
-            return "\n".join(cveOutput)
+            return "\n".join([out for out in cveOutput if out])
         elif outFormat == 'json':
             return cveOutput
         elif outFormat == 'jsonpretty':
             return jprint(cveOutput)
+        elif outFormat == 'jsoncompact':
+            return jprint(cveOutput, compact=True)
 
     def mget_iavas(self, iavas, numThreads=0, onlyCount=False, outFormat='plaintext',
                    urls=False, timeout=300):
         """Use multi-threading to lookup a list of IAVAs and return text output.
 
         *iavas*:      A list of IAVA ids
-        *numThreads*: Number of concurrent worker threads; 0 == CPUs*2
+        *numThreads*: Number of concurrent worker threads; 0 == max(8, CPUs*2)
         *onlyCount*:  Whether to exit after simply logging number of valid/invalid CVEs
-        *outFormat*:  Control output format ("list", "plaintext", "json", or "jsonpretty")
+        *outFormat*:  Control output format ("list", "plaintext", "json", "jsonpretty", or "jsoncompact")
         *urls*:       Whether to add extra URLs to certain fields
         *timeout*:    Total ammount of time to wait for all CVEs to be retrieved
 
@@ -808,9 +1004,10 @@ class ApiClient:
         Setting to "plaintext" returns str object containing formatted output.
         Setting to "json" returns list object (i.e., original JSON)
         Setting to "jsonpretty" returns str object containing prettified JSON
+        Setting to "jsoncompact" returns str object containing compact JSON
         """
-        if outFormat not in ['list', 'plaintext', 'json', 'jsonpretty']:
-            raise ValueError("Invalid outFormat ('{0}') requested; should be one of: 'list', 'plaintext', 'json', 'jsonpretty'".format(outFormat))
+        if outFormat not in ['list', 'plaintext', 'json', 'jsonpretty', 'jsoncompact']:
+            raise ValueError("Invalid outFormat ('{0}') requested; should be one of: 'list', 'plaintext', 'json', 'jsonpretty', 'jsoncompact'".format(outFormat))
         if not isinstance(iavas, list):
             raise ValueError("Invalid 'iavas=' argument input; must be list obj")
         # Configure threads
@@ -820,6 +1017,7 @@ class ApiClient:
         if numThreads > len(iavas):
             numThreads = len(iavas)
         logger.info("Using {0} worker threads".format(numThreads))
+        self._set_pool_size(numThreads)
         # Set cfg directives for our worker
         self.cfg.onlyCount = onlyCount
         self.cfg.outFormat = outFormat
@@ -861,6 +1059,8 @@ class ApiClient:
             return iavaOutput
         elif outFormat == 'jsonpretty':
             return jprint(iavaOutput)
+        elif outFormat == 'jsoncompact':
+            return jprint(iavaOutput, compact=True)
 
     def cve_search_query(self, params, outFormat='list', urls=False):
         """Perform a CVE search query.
@@ -871,14 +1071,17 @@ class ApiClient:
         Setting to "plaintext" returns str object containing new-line separated CVE ids.
         Setting to "json" returns list object containing original JSON.
         Setting to "jsonpretty" returns str object containing prettified JSON.
+        Setting to "jsoncompact" returns str object containing compact JSON.
         """
-        if outFormat not in ['list', 'plaintext', 'json', 'jsonpretty']:
-            raise ValueError("Invalid outFormat ('{0}') requested; should be one of: 'list', 'plaintext', 'json', 'jsonpretty'".format(outFormat))
+        if outFormat not in ['list', 'plaintext', 'json', 'jsonpretty', 'jsoncompact']:
+            raise ValueError("Invalid outFormat ('{0}') requested; should be one of: 'list', 'plaintext', 'json', 'jsonpretty', 'jsoncompact'".format(outFormat))
         result = self.find_cves(params)
         if outFormat == 'json':
             return result
         if outFormat == 'jsonpretty':
             return jprint(result)
+        if outFormat == 'jsoncompact':
+            return jprint(result, compact=True)
         if outFormat == 'list':
             cves = []
             for i in result:
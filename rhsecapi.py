@@ -1,4 +1,4 @@
-#!/usr/bin/python2
+#!/usr/bin/python3
 # -*- coding: utf-8 -*-
 # PYTHON_ARGCOMPLETE_OK
 #-------------------------------------------------------------------------------
@@ -17,7 +17,6 @@
 #-------------------------------------------------------------------------------
 
 # Modules from standard library
-from __future__ import print_function
 import argparse
 import requests
 import sys
@@ -60,8 +59,11 @@ logger.setLevel('NOTICE')
 logger.addHandler(consolehandler)
 
 
-def fpaste_it(inputdata, lang='text', author=None, password=None, private='no', expire=28, project=None, url='http://paste.fedoraproject.org'):
-    """Submit a new paste to fedora project pastebin."""
+def fpaste_it(inputdata, lang='text', author=None, password=None, private='no', expire=28, project=None, url='http://paste.fedoraproject.org', session=None):
+    """Submit a new paste to fedora project pastebin.
+
+    Pass an existing requests.Session as *session* to reuse its connections.
+    """
     # Establish critical params
     params = {
         'paste_data': inputdata,
@@ -82,15 +84,17 @@ def fpaste_it(inputdata, lang='text', author=None, password=None, private='no',
             author = author[0:47] + "..."
         params['paste_user'] = author
     # Check size of what we're about to post and raise exception if too big
-    # FIXME: Figure out how to do this in requests without wasteful call to urllib.urlencode()
-    from urllib import urlencode
+    # FIXME: Figure out how to do this in requests without wasteful call to urllib.parse.urlencode()
+    from urllib.parse import urlencode
     p = urlencode(params)
     pasteSizeKiB = len(p)/1024.0
     if pasteSizeKiB >= 512:
         raise ValueError("Fedora Pastebin client WARN: paste size ({0:.1f} KiB) too large (max size: 512 KiB)".format(pasteSizeKiB))
     # Print status, then connect
     logger.log(25, "Fedora Pastebin client uploading {0:.1f} KiB...".format(pasteSizeKiB))
-    r = requests.post(url, params)
+    if session is None:
+        session = requests.Session()
+    r = session.post(url, params)
     r.raise_for_status()
     try:
         j = r.json()
@@ -98,11 +102,11 @@ def fpaste_it(inputdata, lang='text', author=None, password=None, private='no',
         # If no json returned, we've hit some weird error
         from tempfile import NamedTemporaryFile
         tmp = NamedTemporaryFile(delete=False)
-        print(r.content, file=tmp)
+        tmp.write(r.content)
         tmp.flush()
         raise ValueError("Fedora Pastebin client ERROR: Didn't receive expected JSON response (saved to '{0}' for debugging)".format(tmp.name))
     # Error keys adapted from Jason Farrell's fpaste
-    if j.has_key('error'):
+    if 'error' in j:
         err = j['error']
         if err == 'err_spamguard_php':
             raise ValueError("Fedora Pastebin server ERROR: Poster's IP rejected as malicious")
@@ -118,7 +122,7 @@ def fpaste_it(inputdata, lang='text', author=None, password=None, private='no',
             raise ValueError("Fedora Pastebin server ERROR: '{0}'".format(err))
     # Put together URL with optional hash if requested
     pasteUrl = '{0}/{1}'.format(url, j['result']['id'])
-    if 'yes' in private and j['result'].has_key('hash'):
+    if 'yes' in private and 'hash' in j['result']:
         pasteUrl += '/{0}'.format(j['result']['hash'])
     return pasteUrl
 
@@ -221,7 +225,7 @@ def parse_args():
         help="Extract CVEs from search query (as initiated by at least one of the --q-xxx options or the --iava option)")
     g_getCve.add_argument(
         '-0', '--stdin', action='store_true',
-        help="Extract CVEs from stdin (CVEs will be matched by case-insensitive regex '{0}' and duplicates will be discarded); note that terminal width auto-detection is not possible in this mode and WIDTH defaults to '70' (but can be overridden with '--width')".format(rhsda.cve_regex_string))
+        help="Extract CVEs from stdin (CVEs will be matched by case-insensitive regex '{0}' and duplicates will be discarded)".format(rhsda.cve_regex_string))
     # New group
     g_cveDisplay = p.add_argument_group(
         'CVE DISPLAY OPTIONS')
@@ -242,7 +246,7 @@ def parse_args():
         help="Spotlight a particular PRODUCT via case-insensitive regex; this hides CVEs where 'FIXED_RELEASES' or 'FIX_STATES' don't have an item with 'cpe' (e.g. 'cpe:/o:redhat:enterprise_linux:7') or 'product_name' (e.g. 'Red Hat Enterprise Linux 7') matching PRODUCT; this also hides all items in 'FIXED_RELEASES' & 'FIX_STATES' that don't match PRODUCT")
     g_cveDisplay.add_argument(
         '-j', '--json', action='store_true',
-        help="Print full & raw JSON output")
+        help="Print full & raw JSON output (pretty-printed when stdout is a terminal, compact otherwise)")
     g_cveDisplay.add_argument(
         '-u', '--urls', dest='printUrls', action='store_true',
         help="Print URLs for all relevant fields")
@@ -251,7 +255,7 @@ def parse_args():
         'GENERAL OPTIONS')
     g_general.add_argument(
         '-w', '--wrap', metavar="WIDTH", dest='wrapWidth', nargs='?', default=1, const=70, type=int,
-        help="Change wrap-width of long fields (acknowledgement, details, statement, mitigation, references) in non-json output (default: wrapping WIDTH equivalent to TERMWIDTH-2 unless using '--pastebin' where default WIDTH is '168'; specify '0' to disable wrapping; WIDTH defaults to '70' if option is used but WIDTH is omitted)")
+        help="Change wrap-width of long fields (acknowledgement, details, statement, mitigation, references) in non-json output (default: wrapping WIDTH equivalent to TERMWIDTH-2 when stdout is a terminal, '70' when it isn't, or '168' when using '--pastebin'; specify '0' to disable wrapping; WIDTH defaults to '70' if option is used but WIDTH is omitted)")
     g_general.add_argument(
         '-c', '--count', action='store_true',
         help="Exit after printing CVE counts")
@@ -267,6 +271,15 @@ def parse_args():
     g_general.add_argument(
         '-E', '--pexpire', metavar="DAYS", nargs='?', const=1, default=28, type=int,
         help="Set time in days after which paste will be deleted (defaults to '28'; specify '0' to disable expiration; DAYS defaults to '1' if option is used but DAYS is omitted)")
+    g_general.add_argument(
+        '--cache-ttl', metavar="SECS", dest='cacheTtl', type=int, default=3600,
+        help="Set how long retrieved API responses are cached on disk in '~/.cache/rhsecapi.sqlite' (default: '3600'); only takes effect when optional python module requests_cache is installed")
+    g_general.add_argument(
+        '--no-cache', dest='cacheTtl', action='store_const', const=0,
+        help="Disable the on-disk cache of API responses (equivalent to '--cache-ttl 0')")
+    g_general.add_argument(
+        '--http2', action='store_true',
+        help="Multiplex all API requests over a single HTTP/2 connection (requires optional python module httpx with h2 support); this bypasses the on-disk cache")
     g_general.add_argument(
         '--dryrun', action='store_true',
         help="Skip CVE retrieval; this option only makes sense in concert with --stdin, for the purpose of quickly getting a printable list of CVE ids from stdin")
@@ -283,7 +296,7 @@ def parse_args():
     if o.showHelp:
         from tempfile import NamedTemporaryFile
         from subprocess import call
-        tmp = NamedTemporaryFile(prefix='{0}-help-'.format(prog), suffix='.txt')
+        tmp = NamedTemporaryFile(mode='w', prefix='{0}-help-'.format(prog), suffix='.txt')
         p.print_help(file=tmp)
         tmp.flush()
         call(['less', tmp.name])
@@ -305,7 +318,7 @@ def parse_args():
         }
     if o.q_raw:
         for param in o.q_raw:
-            p = param.split("=")
+            p = param.split("=", 1)
             o.searchParams[p[0]] = p[1]
     # Check for search params (--q-xxx) to determine if performing search
     if all(val is None for val in o.searchParams.values()) and not o.q_empty:
@@ -337,7 +350,11 @@ def parse_args():
     if o.wrapWidth == 1 and o.pastebin:
         o.wrapWidth = 168
     if o.json:
-        o.outFormat = 'jsonpretty'
+        # Skip pretty-printing when piping JSON to another program
+        if sys.stdout.isatty() or o.pastebin:
+            o.outFormat = 'jsonpretty'
+        else:
+            o.outFormat = 'jsoncompact'
     else:
         o.outFormat = 'plaintext'
     logger.setLevel(o.loglevel.upper())
@@ -345,73 +362,76 @@ def parse_args():
 
 
 def main(opts):
-    apiclient = rhsda.ApiClient(opts.loglevel)
-    from os import environ
-    if environ.has_key('RHSDA_URL') and environ['RHSDA_URL'].startswith('http'):
-        apiclient.cfg.apiUrl = environ['RHSDA_URL']
-    searchOutput = ""
-    iavaOutput = ""
-    cveOutput = ""
-    if opts.doSearch:
-        if opts.extract_cves:
-            result = apiclient.cve_search_query(params=opts.searchParams, outFormat='list')
-            for cve in result:
-                opts.cves.append(cve)
-        elif opts.count:
-            result = apiclient.cve_search_query(params=opts.searchParams)
-        else:
-            searchOutput = apiclient.cve_search_query(params=opts.searchParams, outFormat=opts.outFormat, urls=opts.printUrls)
-            if not opts.json:
-                searchOutput += "\n"
-            if not opts.pastebin:
-                print(file=sys.stderr)
-                print(searchOutput, end="")
-    if opts.iavas:
-        logger.debug("IAVAs: {0}".format(opts.iavas))
-        if opts.extract_cves:
-            result = apiclient.mget_iavas(iavas=opts.iavas, numThreads=opts.threads, onlyCount=opts.count, outFormat='list')
-            opts.cves.extend(result)
-        elif opts.count:
-            result = apiclient.mget_iavas(iavas=opts.iavas, numThreads=opts.threads, onlyCount=opts.count)
-        else:
-            iavaOutput = apiclient.mget_iavas(iavas=opts.iavas, numThreads=opts.threads, outFormat=opts.outFormat, urls=opts.printUrls)
-            if not opts.pastebin:
-                print(file=sys.stderr)
-                print(iavaOutput, end="")
-    if opts.cves:
-        originalCount = len(opts.cves)
-        # Converting to a set removes duplicates
-        opts.cves = list(set(opts.cves))
-        dupesRemoved = originalCount - len(opts.cves)
-        if dupesRemoved:
-            logger.log(25, "{0} duplicate CVEs removed".format(dupesRemoved))
-        if opts.dryrun:
-            logger.log(25, "Skipping CVE retrieval due to --dryrun; would have retrieved: {0}".format(len(opts.cves)))
-            cveOutput = " ".join(opts.cves) + "\n"
-        else:
-            if iavaOutput:
-                print(file=sys.stderr)
-            cveOutput = apiclient.mget_cves(cves=opts.cves, numThreads=opts.threads, onlyCount=opts.count, outFormat=opts.outFormat, urls=opts.printUrls, fields=opts.fields, wrapWidth=opts.wrapWidth, product=opts.product)
-    if opts.count:
-        return
-    if opts.pastebin:
-        opts.p_lang = 'text'
-        if opts.json:
-            opts.p_lang = 'Python'
-        data = searchOutput + iavaOutput + cveOutput
-        try:
-            response = fpaste_it(inputdata=data, author=prog, lang=opts.p_lang, expire=opts.pexpire)
-        except ValueError as e:
-            print(e, file=sys.stderr)
-            logger.error("Submitting to pastebin failed; print results to stdout instead? [y]")
-            answer = raw_input("> ")
-            if "y" in answer or len(answer) == 0:
-                print(data, end="")
-        else:
-            print(response)
-    elif opts.cves:
-        print(file=sys.stderr)
-        print(cveOutput, end="")
+    apiclient = rhsda.ApiClient(opts.loglevel, cacheTtl=opts.cacheTtl, http2=opts.http2)
+    try:
+        from os import environ
+        if 'RHSDA_URL' in environ and environ['RHSDA_URL'].startswith('http'):
+            apiclient.cfg.apiUrl = environ['RHSDA_URL']
+        searchOutput = ""
+        iavaOutput = ""
+        cveOutput = ""
+        if opts.doSearch:
+            if opts.extract_cves:
+                result = apiclient.cve_search_query(params=opts.searchParams, outFormat='list')
+                for cve in result:
+                    opts.cves.append(cve)
+            elif opts.count:
+                result = apiclient.cve_search_query(params=opts.searchParams)
+            else:
+                searchOutput = apiclient.cve_search_query(params=opts.searchParams, outFormat=opts.outFormat, urls=opts.printUrls)
+                if not opts.json:
+                    searchOutput += "\n"
+                if not opts.pastebin:
+                    print(file=sys.stderr)
+                    print(searchOutput, end="")
+        if opts.iavas:
+            logger.debug("IAVAs: {0}".format(opts.iavas))
+            if opts.extract_cves:
+                result = apiclient.mget_iavas(iavas=opts.iavas, numThreads=opts.threads, onlyCount=opts.count, outFormat='list')
+                opts.cves.extend(result)
+            elif opts.count:
+                result = apiclient.mget_iavas(iavas=opts.iavas, numThreads=opts.threads, onlyCount=opts.count)
+            else:
+                iavaOutput = apiclient.mget_iavas(iavas=opts.iavas, numThreads=opts.threads, outFormat=opts.outFormat, urls=opts.printUrls)
+                if not opts.pastebin:
+                    print(file=sys.stderr)
+                    print(iavaOutput, end="")
+        if opts.cves:
+            originalCount = len(opts.cves)
+            # Remove duplicates, keeping first-seen order
+            opts.cves = list(dict.fromkeys(opts.cves))
+            dupesRemoved = originalCount - len(opts.cves)
+            if dupesRemoved:
+                logger.log(25, "{0} duplicate CVEs removed".format(dupesRemoved))
+            if opts.dryrun:
+                logger.log(25, "Skipping CVE retrieval due to --dryrun; would have retrieved: {0}".format(len(opts.cves)))
+                cveOutput = " ".join(opts.cves) + "\n"
+            else:
+                if iavaOutput:
+                    print(file=sys.stderr)
+                cveOutput = apiclient.mget_cves(cves=opts.cves, numThreads=opts.threads, onlyCount=opts.count, outFormat=opts.outFormat, urls=opts.printUrls, fields=opts.fields, wrapWidth=opts.wrapWidth, product=opts.product)
+        if opts.count:
+            return
+        if opts.pastebin:
+            opts.p_lang = 'text'
+            if opts.json:
+                opts.p_lang = 'Python'
+            data = searchOutput + iavaOutput + cveOutput
+            try:
+                response = fpaste_it(inputdata=data, author=prog, lang=opts.p_lang, expire=opts.pexpire, session=apiclient.session)
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                logger.error("Submitting to pastebin failed; print results to stdout instead? [y]")
+                answer = input("> ")
+                if "y" in answer or len(answer) == 0:
+                    print(data, end="")
+            else:
+                print(response)
+        elif opts.cves:
+            print(file=sys.stderr)
+            print(cveOutput, end="")
+    finally:
+        apiclient.close()
 
 
 if __name__ == "__main__":